@@ -6,11 +6,18 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
-import time
 import os
+import glob
+import threading
+import time
+import pyarrow as pa
 from datetime import datetime
-import hashlib
+
+# The refined frame is cached once and shared by every session. With
+# copy-on-write, a slice that a rerun modifies copies itself instead of
+# writing through to the cached data. (Always on from pandas 3.0.)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
 # ==========================
 # PAGE CONFIG
@@ -25,67 +32,312 @@ st.set_page_config(
 # ==========================
 # CACHE DIRECTORIES
 # ==========================
-# Get the directory where this script is located
-script_dir = os.path.dirname(os.path.abspath(__file__))
+@st.cache_resource(show_spinner=False)
+def _bootstrap_paths():
+    """Resolve and create the app directories once per process, not on every rerun"""
+    # Get the directory where this script is located
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    cache_dir = os.path.join(base_dir, "cache")
+    data_dir = os.path.join(base_dir, "data")
+    # isdir() is a single stat; makedirs(exist_ok=True) would still issue a
+    # mkdir that fails with EEXIST
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    if not os.path.isdir(data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+    return base_dir, cache_dir, data_dir
 
-CACHE_DIR = os.path.join(script_dir, "cache")
-DATA_DIR = os.path.join(script_dir, "data")
-os.makedirs(CACHE_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
+script_dir, CACHE_DIR, DATA_DIR = _bootstrap_paths()
 
 COINGECKO_CACHE = os.path.join(CACHE_DIR, "coingecko_streamlit_cache.csv")
 DEFILLAMA_CACHE = os.path.join(CACHE_DIR, "defillama_streamlit_cache.csv")
 
+# Refined dataset file names, most complete first; the analyzer's Parquet
+# export of the full dataset is preferred over its CSV twin unless older
+_REFINED_FILES = (
+    "uniswap_v3_full_refined.parquet",
+    "uniswap_v3_full_refined.csv",
+    "uniswap_v3_top100_pools.csv",
+)
+
+# Candidate locations for the refined dataset, in priority order.
+# Computed once at import so cache misses don't rebuild the list.
+_REFINED_PATHS = (
+    # Relative to script location (database folder)
+    os.path.join(script_dir, "data", "uniswap_v3_full_refined.csv"),
+    os.path.join(script_dir, "data", "uniswap_v3_top100_pools.csv"),
+
+    # In case we're running from root directory
+    os.path.join(script_dir, "..", "database", "data", "uniswap_v3_full_refined.csv"),
+    os.path.join(script_dir, "..", "database", "data", "uniswap_v3_top100_pools.csv"),
+
+    # Original relative paths as fallback
+    "data/uniswap_v3_full_refined.csv",
+    "../data/uniswap_v3_full_refined.csv",
+    "./data/uniswap_v3_full_refined.csv",
+    "uniswap_v3_full_refined.csv",
+    "data/uniswap_v3_top100_pools.csv",
+    "../data/uniswap_v3_top100_pools.csv",
+    "./data/uniswap_v3_top100_pools.csv",
+    "uniswap_v3_top100_pools.csv"
+)
+
+# Fixed data file for deployments with a known layout (Docker/K8s); when set
+# and present, it is used directly and the candidate probe is skipped
+REFINED_PATH = os.environ.get("UNISWAP_REFINED_CSV")
+
+# Known numeric columns of the refined dataset, passed to the Arrow CSV
+# reader so it can skip per-column type inference
+_REFINED_SCHEMA = {
+    "page": pa.uint16(),
+    "last_price": pa.float64(),
+    "volume_usd": pa.float64(),
+    "bid_ask_spread": pa.float64(),
+    "liquidity_score": pa.float64(),
+}
+
+# How often the background watcher checks the refined file for a new version
+_WATCH_INTERVAL_SECONDS = 60
+
+# String columns stay Arrow-backed in pandas (one contiguous buffer plus
+# offsets, Arrow compute kernels for .str ops) instead of Python objects.
+# Numeric columns keep NumPy dtypes for the NumPy-based filters.
+_ARROW_STRING_TYPES = {
+    pa.string(): pd.ArrowDtype(pa.string()),
+    pa.large_string(): pd.ArrowDtype(pa.large_string()),
+}
+
+# Refined CSVs above this size are parsed from a memory map
+_MMAP_MIN_BYTES = 1 << 20
+
+# Heavily repeated token/exchange labels, stored as categoricals so filters
+# and groupbys work on small integer codes instead of Python strings
+_CATEGORICAL_COLUMNS = ("base", "target", "market")
+
+# Bounded 0-100 score rounded to 2 decimals, so float32 is lossless for
+# display while halving the bytes each mask scan reads. volume_usd,
+# last_price and bid_ask_spread (an unbounded, signed percentage that is
+# displayed and exported) stay float64.
+_FLOAT32_COLUMNS = ("liquidity_score",)
+
+# Points drawn in the volume/liquidity scatter; larger selections are sampled
+_SCATTER_MAX_POINTS = 5000
+
+# Trust grades from worst to best; trust_grade is an ordered categorical
+_TRUST_GRADES = ['D', 'C', 'B', 'A']
+
 # ==========================
 # UTILITY FUNCTIONS
 # ==========================
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def load_refined_data():
-    """Load pre-processed data from CSV files - prioritize full refined data"""
+@st.cache_resource(show_spinner=False)
+def _resolve_refined_path():
+    """Return the first existing refined data file, or None"""
+    if REFINED_PATH and os.path.isfile(REFINED_PATH):
+        return REFINED_PATH
     
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
+    # Usual layout: a single scandir of the data folder; d_type answers
+    # is_file() without a stat per entry
+    try:
+        with os.scandir(DATA_DIR) as it:
+            entries = {e.name: e for e in it if e.is_file()}
+        for name in _REFINED_FILES:
+            if name in entries:
+                entry = entries[name]
+                # The Parquet export only wins while it is at least as new as
+                # its CSV twin; a failed or skipped export must not pin old data
+                if name.endswith(".parquet"):
+                    twin = entries.get(name[:-len(".parquet")] + ".csv")
+                    if twin is not None and entry.stat().st_mtime < twin.stat().st_mtime:
+                        continue
+                return entry.path
+    except OSError:
+        pass
     
-    # Define possible paths - both relative to script and absolute
-    possible_paths = [
-        # Relative to script location (database folder)
-        os.path.join(script_dir, "data", "uniswap_v3_full_refined.csv"),
-        os.path.join(script_dir, "data", "uniswap_v3_top100_pools.csv"),
-        
-        # In case we're running from root directory
-        os.path.join(script_dir, "..", "database", "data", "uniswap_v3_full_refined.csv"),
-        os.path.join(script_dir, "..", "database", "data", "uniswap_v3_top100_pools.csv"),
-        
-        # Original relative paths as fallback
-        "data/uniswap_v3_full_refined.csv",
-        "../data/uniswap_v3_full_refined.csv", 
-        "./data/uniswap_v3_full_refined.csv",
-        "uniswap_v3_full_refined.csv",
-        "data/uniswap_v3_top100_pools.csv",
-        "../data/uniswap_v3_top100_pools.csv",
-        "./data/uniswap_v3_top100_pools.csv",
-        "uniswap_v3_top100_pools.csv"
-    ]
+    # Other layouts: one directory listing per folder instead of one stat
+    # per candidate path
+    listings = {}
+    for path in _REFINED_PATHS:
+        folder = os.path.normpath(os.path.dirname(path) or ".")
+        if folder not in listings:
+            pattern = os.path.join(glob.escape(folder), "uniswap_v3_*.csv")
+            listings[folder] = {os.path.basename(p) for p in glob.glob(pattern)}
+        if os.path.basename(path) in listings[folder] and os.path.isfile(path):
+            return path
+    return None
+
+def _read_refined_csv(file_path):
+    """Parse a refined CSV into an Arrow table with the multithreaded reader"""
+    # Only needed when the IPC mirror is missing or stale
+    import pyarrow.csv as pacsv
+    
+    read_options = pacsv.ReadOptions(use_threads=True)
+    convert_options = pacsv.ConvertOptions(
+        column_types=_REFINED_SCHEMA,
+        strings_can_be_null=True
+    )
+    
+    # Large files are parsed straight from a memory map: no read() copy into
+    # a user-space buffer, and the page cache is shared across workers.
+    # Small files aren't worth the mmap setup.
+    if os.path.getsize(file_path) > _MMAP_MIN_BYTES:
+        with pa.memory_map(file_path, "r") as source:
+            return pacsv.read_csv(source, read_options=read_options,
+                                  convert_options=convert_options)
+    return pacsv.read_csv(file_path, read_options=read_options,
+                          convert_options=convert_options)
+
+def _read_refined_source(file_path):
+    """Read a refined Parquet or CSV file into an Arrow table"""
+    if file_path.endswith(".parquet"):
+        # Typed and columnar already - no text parsing or type inference
+        import pyarrow.parquet as pq
+        return pq.read_table(file_path)
+    return _read_refined_csv(file_path)
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_refined_table(file_path, mtime, size):
+    """Load a refined file as an Arrow table memory-mapped from its IPC mirror
     
-    # Try each path
-    for file_path in possible_paths:
-        if os.path.exists(file_path):
+    mtime and size only key the cache: the entry stays valid until the
+    file on disk actually changes, instead of expiring on a timer.
+    """
+    arrow_path = file_path + ".arrow"
+    if not (os.path.isfile(arrow_path)
+            and os.path.getmtime(arrow_path) >= os.path.getmtime(file_path)):
+        table = _read_refined_source(file_path)
+        
+        # Write to a temp file first so concurrent readers never see a partial mirror
+        tmp_path = f"{arrow_path}.{os.getpid()}.tmp"
+        try:
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, arrow_path)
+        except OSError:
+            # Read-only data directory or a failed write (e.g. disk full) -
+            # drop any partial temp file and serve the parsed file
             try:
-                df = pd.read_csv(file_path)
-                if "full_refined" in file_path:
-                    return df, "full"
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return table
+    
+    # The mapping is shared by every session and worker reading this file
+    return pa.ipc.open_file(pa.memory_map(arrow_path, "r")).read_all()
+
+def _add_derived_columns(df):
+    """Ensure required columns exist, once per loaded file"""
+    required_cols = ['volume_usd', 'liquidity_score', 'trust_grade']
+    
+    for col in required_cols:
+        if col not in df.columns:
+            if col == 'volume_usd':
+                volume_candidates = [c for c in df.columns if 'volume' in c.lower()]
+                if volume_candidates:
+                    volumes = pd.to_numeric(df[volume_candidates[0]], errors='coerce').to_numpy(
+                        dtype=np.float64, na_value=np.nan, copy=True
+                    )
+                    # Zero the unparseable entries in place, in one pass (infinities are
+                    # kept, as fillna did; the copy above keeps the buffer writable)
+                    df['volume_usd'] = np.nan_to_num(volumes, nan=0.0, posinf=np.inf, neginf=-np.inf, copy=False)
                 else:
-                    return df, "top100"
-            except Exception as e:
-                st.error(f"Error loading {file_path}: {str(e)}")
-                continue
+                    df['volume_usd'] = 0
+            elif col == 'liquidity_score':
+                max_vol = df['volume_usd'].max() if 'volume_usd' in df.columns else 1
+                df['liquidity_score'] = ((df['volume_usd'] / max_vol) * 100).round(2) if max_vol > 0 else 0
+            elif col == 'trust_grade':
+                scores = pd.to_numeric(df['liquidity_score'], errors='coerce').fillna(0)
+                df['trust_grade'] = pd.cut(
+                    scores, bins=[-np.inf, 20, 50, 80, np.inf], labels=_TRUST_GRADES, right=False
+                )
     
-    # Debug information
+    return df
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_refined_frame(file_path, mtime, size):
+    """Build the analysis-ready DataFrame for one version of a refined file
+    
+    The frame is shared by every session, so callers must treat it as read-only.
+    """
+    table = _load_refined_table(file_path, mtime, size)
+    df = _add_derived_columns(table.to_pandas(types_mapper=_ARROW_STRING_TYPES.get))
+    for col in _CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    # Fixed, ordered categories: grade filters compare int8 codes and charts
+    # color the grades in a stable order
+    df['trust_grade'] = pd.Categorical(df['trust_grade'], categories=_TRUST_GRADES, ordered=True)
+    
+    for col in _FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float32)
+    
+    # Shrink any remaining integer columns to the narrowest lossless width
+    for col in df.select_dtypes("integer").columns:
+        unsigned = (df[col] >= 0).all()
+        df[col] = pd.to_numeric(df[col], downcast="unsigned" if unsigned else "integer")
+    df.attrs["source"] = (file_path, mtime, size)
+    return df
+
+@st.cache_resource(show_spinner=False)
+def _start_refined_watcher():
+    """Start one daemon thread per process that pre-loads new versions of the data file
+    
+    When the analyzer rewrites the CSV, the watcher parses it in the
+    background so the next user request finds the new frame already cached
+    instead of blocking on the parse. The path is re-resolved every cycle,
+    so a more complete file that appears later (full dataset after a
+    top-100-only start, a fresher CSV than the Parquet) is picked up too.
+    """
+    def watch():
+        while True:
+            time.sleep(_WATCH_INTERVAL_SECONDS)
+            try:
+                _resolve_refined_path.clear()
+                file_path = _resolve_refined_path()
+                if file_path is None:
+                    _resolve_refined_path.clear()  # Never cache a miss
+                    continue
+                stat = os.stat(file_path)
+                _load_refined_frame(file_path, stat.st_mtime, stat.st_size)
+            except Exception:
+                continue  # The next request reports the error to the user
+    
+    watcher = threading.Thread(target=watch, name="refined-data-watcher", daemon=True)
+    watcher.start()
+    return watcher
+
+def load_refined_data():
+    """Load pre-processed data from CSV files - prioritize full refined data"""
+    
+    _start_refined_watcher()
+    
+    file_path = _resolve_refined_path()
+    if file_path is not None:
+        try:
+            stat = os.stat(file_path)
+            df = _load_refined_frame(file_path, stat.st_mtime, stat.st_size)
+            if "full_refined" in file_path:
+                return df, "full"
+            else:
+                return df, "top100"
+        except Exception as e:
+            st.error(f"Error loading {file_path}: {str(e)}")
+            _resolve_refined_path.clear()
+    else:
+        _resolve_refined_path.clear()  # Probe again once the analyzer has run
+    
+    # Debug information - collapsed into one element instead of a message per path
     st.error("❌ No refined data files found.")
-    st.info(f"Script is running from: {script_dir}")
-    st.info("Looking for files in these locations:")
-    for path in possible_paths[:4]:  # Show first few paths
-        st.write(f"- {path} (exists: {os.path.exists(path)})")
+    with st.expander("Path diagnostics", expanded=False):
+        st.code(
+            f"Script is running from: {script_dir}\n"
+            "Looking for files in these locations:\n"
+            + "\n".join(
+                f"- {path} (exists: {'yes' if os.path.isfile(path) else 'no'})"
+                for path in _REFINED_PATHS[:4]  # Show first few paths
+            )
+        )
     
     st.info("""
     **To fix this:**
@@ -95,13 +347,55 @@ def load_refined_data():
     """)
     return pd.DataFrame(), "none"
 
+# ==========================
+# FILTER MASKS
+# ==========================
+# Each predicate is cached as a boolean array over the full frame, keyed on
+# the widget value, so only predicates whose widget changed are recomputed.
+# The frame is keyed on the file version it was built from (see
+# _load_refined_frame) rather than hashing every row on each rerun.
+# Every mask is N bools keyed on free-form widget values, so each cache is
+# bounded; the oldest entries (including old file versions) are evicted.
+def _frame_key(df):
+    """Cheap cache key for the shared refined frame"""
+    return df.attrs.get("source", id(df))
+
+_FRAME_HASH_FUNCS = {pd.DataFrame: _frame_key}
+
+# Tokens that qualify a pool for "Major Pairs Only"
+_MAJOR_TOKENS_PATTERN = r'USDT|USDC|DAI|WETH|WBTC'
+
+@st.cache_data(hash_funcs=_FRAME_HASH_FUNCS, max_entries=50, show_spinner=False)
+def _mask_at_least(df, column, threshold):
+    """Rows where df[column] >= threshold"""
+    # Compare the column's NumPy buffer directly: no result Series or Index
+    return df[column].to_numpy() >= threshold
+
+@st.cache_data(hash_funcs=_FRAME_HASH_FUNCS, max_entries=50, show_spinner=False)
+def _mask_isin(df, column, values):
+    """Rows where df[column] is one of values"""
+    series = df[column]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Translate the selection to category codes once and compare integers
+        codes = series.cat.categories.get_indexer(list(values))
+        return np.isin(series.cat.codes.to_numpy(), codes[codes >= 0])
+    return series.isin(values).to_numpy()
+
+@st.cache_data(hash_funcs=_FRAME_HASH_FUNCS, max_entries=4, show_spinner=False)
+def _mask_major_pairs(df):
+    """Rows whose trading pair includes a major stable/bluechip token"""
+    # One regex scan over the column instead of one substring scan per token
+    mask = df['trading_pair'].str.contains(_MAJOR_TOKENS_PATTERN, case=False, regex=True, na=False)
+    return mask.to_numpy(dtype=bool)
+
 # ==========================
 # SEARCH FUNCTION
 # ==========================
-def apply_search_filter(df, search_query):
-    """Apply search filter across multiple columns"""
+@st.cache_data(hash_funcs=_FRAME_HASH_FUNCS, max_entries=50, show_spinner=False)
+def search_mask(df, search_query):
+    """Boolean mask of rows matching the search query across multiple columns"""
     if not search_query or search_query.strip() == "":
-        return df
+        return np.ones(len(df), dtype=bool)
     
     search_query = search_query.lower().strip()
     
@@ -121,27 +415,163 @@ def apply_search_filter(df, search_query):
             searchable_columns.append(col)
     
     if not searchable_columns:
-        return df
+        return np.ones(len(df), dtype=bool)
     
     # Create search mask
-    search_mask = pd.Series([False] * len(df))
+    mask = np.zeros(len(df), dtype=bool)
     
     for col in searchable_columns:
         try:
-            # Convert to string and search (case-insensitive)
-            col_mask = df[col].astype(str).str.lower().str.contains(search_query, na=False, regex=False)
-            search_mask = search_mask | col_mask
+            # Convert to string and search (case-insensitive); Arrow-backed
+            # columns are searched in place without materializing Python strings
+            values = df[col]
+            if not isinstance(values.dtype, pd.ArrowDtype):
+                values = values.astype(str)
+            col_mask = values.str.lower().str.contains(search_query, na=False, regex=False)
+            mask |= col_mask.to_numpy(dtype=bool)
         except Exception:
             continue
     
-    return df[search_mask]
+    return mask
 
 # ==========================
-# MAIN APP
+# DISPLAY HELPERS
 # ==========================
-def main():
-    # Custom Header with Modern Design
-    st.markdown("""
+def format_volume(sub):
+    """Replace volume_usd with a formatted Volume($) column for the rows being shown
+    
+    Formatting happens per displayed slice, so its cost scales with rows
+    shown rather than rows loaded.
+    """
+    if 'volume_usd' not in sub.columns:
+        return sub
+    position = sub.columns.get_loc('volume_usd')
+    formatted = [f"${x:,.0f}" for x in sub['volume_usd'].to_numpy()]
+    sub = sub.drop(columns=['volume_usd'])
+    sub.insert(position, 'Volume($)', formatted)
+    return sub
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def csv_bytes(_sub, key):
+    """CSV download payload for the displayed rows, reused while the selection is unchanged
+    
+    The frame itself is not hashed (Streamlit samples large frames, so two
+    selections could collide); key must name everything that determines it:
+    file version, filter values, sort and columns.
+    """
+    return _sub.to_csv(index=False).encode("utf-8")
+
+def top_k_positions(values, k, largest=True):
+    """Positions of the k largest (or smallest) non-NaN values, best first
+    
+    np.partition finds the kth key in a single O(n) pass and only the k
+    survivors are sorted, instead of a full nlargest/nsmallest per table.
+    Ties keep frame order, matching nlargest/nsmallest(keep='first').
+    """
+    candidates = np.flatnonzero(~np.isnan(values))
+    keys = -values[candidates] if largest else values[candidates]
+    if len(candidates) > k:
+        kth = np.partition(keys, k - 1)[k - 1]
+        # Everything strictly better than the kth key, then the earliest
+        # rows equal to it; candidates stay in frame order
+        better = np.flatnonzero(keys < kth)
+        ties = np.flatnonzero(keys == kth)[:k - len(better)]
+        keep = np.sort(np.concatenate([better, ties]))
+        candidates, keys = candidates[keep], keys[keep]
+    return candidates[np.argsort(keys, kind="stable")]
+
+# ==========================
+# POOL SUMMARY
+# ==========================
+@st.cache_data(hash_funcs=_FRAME_HASH_FUNCS, show_spinner=False)
+def pool_summary(df):
+    """Frame-wide figures for the sidebar and metric cards, computed once per file version"""
+    return {
+        "total_pools": len(df),
+        "total_volume": float(df['volume_usd'].sum()) if 'volume_usd' in df.columns else 0,
+        "max_volume": float(df['volume_usd'].max()) if 'volume_usd' in df.columns else None,
+        "avg_liquidity": float(df['liquidity_score'].mean()) if 'liquidity_score' in df.columns else 0,
+        "markets": df['market'].dropna().unique().tolist() if 'market' in df.columns else [],
+        "numeric_columns": df.select_dtypes(include=[np.number]).columns.tolist(),
+    }
+
+# ==========================
+# FILTER PIPELINE
+# ==========================
+def _trending_threshold(df, mask):
+    """80th percentile volume of the rows still selected by mask (NaN if none)"""
+    volumes = df['volume_usd'].to_numpy()[mask]
+    return float(np.nanquantile(volumes, 0.8)) if volumes.size else np.nan
+
+@st.cache_data(hash_funcs=_FRAME_HASH_FUNCS, max_entries=100, show_spinner=False)
+def filtered_positions(df, search_query, min_volume, volume_tier, trust_grades,
+                       min_liquidity_score, quick_filter, show_trending, show_stable, markets):
+    """Row positions of df passing every active filter, or None when every row passes
+    
+    Cached on the filter values, so reruns from unrelated widgets (sorting,
+    tabs, downloads) skip the whole filter chain.
+    """
+    # Every active filter is AND-ed in place into one buffer, so there is a
+    # single allocation no matter how many filters are on
+    mask = np.ones(len(df), dtype=bool)
+    
+    # Apply search filter first
+    if search_query and search_query.strip():
+        mask &= search_mask(df, search_query)
+    
+    # Apply volume filter
+    if min_volume > 0 and 'volume_usd' in df.columns:
+        mask &= _mask_at_least(df, 'volume_usd', min_volume)
+    
+    # Apply volume tier filter
+    if volume_tier != "All Volumes" and 'volume_usd' in df.columns:
+        if "Whale" in volume_tier:
+            mask &= _mask_at_least(df, 'volume_usd', 1000000)
+        elif "Shark" in volume_tier:
+            mask &= _mask_at_least(df, 'volume_usd', 100000)
+        elif "Fish" in volume_tier:
+            mask &= _mask_at_least(df, 'volume_usd', 10000)
+    
+    # Apply trust grade filter
+    if trust_grades and 'trust_grade' in df.columns:
+        if len(trust_grades) < 4:  # Not all grades selected
+            mask &= _mask_isin(df, 'trust_grade', trust_grades)
+    
+    # Apply liquidity score filter
+    if min_liquidity_score > 0 and 'liquidity_score' in df.columns:
+        mask &= _mask_at_least(df, 'liquidity_score', min_liquidity_score)
+    
+    # Apply quick filters
+    if quick_filter == "high_volume" and 'volume_usd' in df.columns:
+        mask &= _mask_at_least(df, 'volume_usd', 1000000)  # >$1M
+    elif quick_filter == "top_rated" and 'trust_grade' in df.columns:
+        mask &= _mask_isin(df, 'trust_grade', ('A',))
+    elif quick_filter == "trending" and 'volume_usd' in df.columns:
+        mask &= _mask_at_least(df, 'volume_usd', _trending_threshold(df, mask))
+    
+    # Advanced filters
+    if show_trending and 'volume_usd' in df.columns:
+        # Show top 20% by volume as "trending"
+        mask &= _mask_at_least(df, 'volume_usd', _trending_threshold(df, mask))
+    
+    if show_stable and 'trading_pair' in df.columns:
+        # Filter for major stable pairs
+        mask &= _mask_major_pairs(df)
+    
+    # Market filter
+    if markets and 'market' in df.columns:
+        if len(markets) < len(pool_summary(df)['markets']):
+            mask &= _mask_isin(df, 'market', markets)
+    
+    return None if mask.all() else np.flatnonzero(mask)
+
+# ==========================
+# STATIC MARKUP
+# ==========================
+# Emitted together in one st.markdown call per rerun. Streamlit drops any
+# element a rerun does not re-emit, so the CSS cannot be sent only once per
+# session; keeping it in a single message is the cheapest option.
+_HEADER_HTML = """
     <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%, #f093fb 100%); 
                 padding: 40px 20px; border-radius: 20px; margin-bottom: 30px; text-align: center;
                 box-shadow: 0 10px 30px rgba(0,0,0,0.1);">
@@ -163,43 +593,10 @@ def main():
             </div>
         </div>
     </div>
-    """, unsafe_allow_html=True)
-    
-    # Load refined data first
-    with st.spinner("Loading refined pool data..."):
-        df, data_source = load_refined_data()
-    
-    if df.empty:
-        st.error("❌ No data available. Please run the main analyzer script first to generate refined data.")
-        return
-    
-    # Ensure required columns exist and clean data
-    required_cols = ['volume_usd', 'liquidity_score', 'trust_grade']
-    
-    for col in required_cols:
-        if col not in df.columns:
-            if col == 'volume_usd':
-                volume_candidates = [c for c in df.columns if 'volume' in c.lower()]
-                if volume_candidates:
-                    df['volume_usd'] = pd.to_numeric(df[volume_candidates[0]], errors='coerce').fillna(0)
-                else:
-                    df['volume_usd'] = 0
-            elif col == 'liquidity_score':
-                max_vol = df['volume_usd'].max() if 'volume_usd' in df.columns else 1
-                df['liquidity_score'] = ((df['volume_usd'] / max_vol) * 100).round(2) if max_vol > 0 else 0
-            elif col == 'trust_grade':
-                df['trust_grade'] = df.get('liquidity_score', 0).apply(lambda x: 
-                    'A' if x >= 80 else 'B' if x >= 50 else 'C' if x >= 20 else 'D')
-    
-    if 'volume_formatted' not in df.columns and 'volume_usd' in df.columns:
-        df['volume_formatted'] = df['volume_usd'].apply(lambda x: f"${x:,.0f}")
-    
-    # ==========================
-    # SIMPLIFIED SIDEBAR
-    # ==========================
-    
-    # Custom CSS for enhanced sidebar styling
-    st.markdown("""
+    """
+
+# Custom CSS for enhanced sidebar styling
+_APP_CSS = """
     <style>
     /* Enhanced Sidebar Styling */
     .sidebar .sidebar-content {
@@ -368,8 +765,31 @@ def main():
         }
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
 
+# ==========================
+# MAIN APP
+# ==========================
+def main():
+    # Custom Header with Modern Design, plus the page CSS in the same message
+    st.markdown(_HEADER_HTML + _APP_CSS, unsafe_allow_html=True)
+    
+    # Load refined data first
+    with st.spinner("Loading refined pool data..."):
+        df, data_source = load_refined_data()
+    
+    if df.empty:
+        st.error("❌ No data available. Please run the main analyzer script first to generate refined data.")
+        return
+    
+    summary = pool_summary(df)
+    # Filters only select rows, so every slice below has the same columns
+    cols = frozenset(df.columns)
+    
+    # ==========================
+    # SIMPLIFIED SIDEBAR
+    # ==========================
+    
     # Add background pattern
     st.sidebar.markdown('<div class="sidebar-bg-pattern"></div>', unsafe_allow_html=True)
 
@@ -388,30 +808,27 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+    # A button click already reruns the script, and these handlers run before
+    # the search box and the filters read session_state, so no st.rerun() here
     col1, col2 = st.sidebar.columns(2)
     with col1:
         if st.button("🔥 High Volume", key="high_vol", help="Show pools with >$1M volume"):
             st.session_state.quick_filter = "high_volume"
-            st.rerun()
 
     with col2:
         if st.button("⭐ Top Rated", key="top_rated", help="Show only Grade A pools"):
             st.session_state.quick_filter = "top_rated"
-            st.rerun()
 
     col3, col4 = st.sidebar.columns(2)
     with col3:
         if st.button("💎 Trending", key="trending", help="Show trending pools"):
             st.session_state.quick_filter = "trending"
-            st.rerun()
 
     with col4:
         if st.button("🎯 Clear All", key="clear_all", help="Reset all filters"):
-            if 'quick_filter' in st.session_state:
-                del st.session_state.quick_filter
+            st.session_state.pop('quick_filter', None)
             # Clear search as well
             st.session_state.search_input = ""
-            st.rerun()
 
     # Token Search Filter - positioned right above minimum volume
     search_query = st.sidebar.text_input(
@@ -425,7 +842,7 @@ def main():
     min_volume = st.sidebar.number_input(
         "💵 Minimum Volume ($)",
         min_value=0,
-        max_value=int(df['volume_usd'].max()) if 'volume_usd' in df.columns else 10**9,
+        max_value=int(summary['max_volume']) if summary['max_volume'] is not None else 10**9,
         value=0,
         step=1000,
         help="Filter pools by minimum trading volume"
@@ -448,7 +865,7 @@ def main():
     )
 
     # Quality score range
-    if 'liquidity_score' in df.columns:
+    if 'liquidity_score' in cols:
         min_liquidity_score = st.sidebar.slider(
             "⚡ Min Liquidity Score",
             min_value=0,
@@ -475,8 +892,8 @@ def main():
 
     # Market selection (if available)
     selected_markets = None
-    if 'market' in df.columns:
-        available_markets = df['market'].dropna().unique().tolist()
+    if 'market' in cols:
+        available_markets = summary['markets']
         if len(available_markets) > 1:
             st.sidebar.markdown("🏪 **Select Markets**")
             selected_markets = st.sidebar.multiselect(
@@ -493,6 +910,10 @@ def main():
 
     if st.sidebar.button("🔄 Refresh Data", help="Clear cache and reload fresh data", type="primary"):
         st.cache_data.clear()
+        # Clear the data caches only - the watcher thread must stay a singleton
+        _resolve_refined_path.clear()
+        _load_refined_table.clear()
+        _load_refined_frame.clear()
         st.rerun()
 
     st.sidebar.markdown("</div>", unsafe_allow_html=True)
@@ -516,8 +937,8 @@ def main():
     st.subheader("🔎 View Controls")
     colA, colB = st.columns([2, 1])
     with colA:
-        if 'market' in df.columns:
-            available_markets = df['market'].dropna().unique().tolist()
+        if 'market' in cols:
+            available_markets = summary['markets']
             if selected_markets is None:
                 selected_markets = available_markets
             selected_markets_main = st.multiselect(
@@ -529,9 +950,9 @@ def main():
         else:
             selected_markets_main = None
     with colB:
-        available_sort_columns = [c for c in ['volume_usd', 'liquidity_score', 'last_price'] if c in df.columns]
+        available_sort_columns = [c for c in ['volume_usd', 'liquidity_score', 'last_price'] if c in cols]
         if not available_sort_columns:
-            numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+            numeric_cols = summary['numeric_columns']
             available_sort_columns = numeric_cols[:4] if numeric_cols else [df.columns[0]]
         sort_by = st.selectbox("Sort By", options=available_sort_columns, index=0)
         ascending = st.checkbox("Ascending Order", value=False, help="Toggle sort order")
@@ -539,109 +960,60 @@ def main():
     # Metrics Cards
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
                     padding: 20px; border-radius: 10px; color: white; text-align: center; margin-bottom: 10px;">
             <h4 style="margin: 0; font-size: 16px;">💼 Total Pools</h4>
-            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">{:,}</h2>
+            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">{summary['total_pools']:,}</h2>
         </div>
-        """.format(len(df)), unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
     
     with col2:
-        top_100_volume = df.nlargest(100, 'volume_usd') if 'volume_usd' in df.columns else df.head(100)
-        st.markdown("""
+        # The card shows only how many pools the top 100 holds
+        top_100_count = min(100, len(df))
+        st.markdown(f"""
         <div style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%); 
                     padding: 20px; border-radius: 10px; color: white; text-align: center; margin-bottom: 10px;">
             <h4 style="margin: 0; font-size: 16px;">🔥 High Volume Pools</h4>
-            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">{:,}</h2>
+            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">{top_100_count:,}</h2>
         </div>
-        """.format(len(top_100_volume)), unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
     
     with col3:
-        total_volume = df['volume_usd'].sum() if 'volume_usd' in df.columns else 0
-        st.markdown("""
+        st.markdown(f"""
         <div style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%); 
                     padding: 20px; border-radius: 10px; color: white; text-align: center; margin-bottom: 10px;">
             <h4 style="margin: 0; font-size: 16px;">💰 Total Volume</h4>
-            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">${:,.0f}</h2>
+            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">${summary['total_volume']:,.0f}</h2>
         </div>
-        """.format(total_volume), unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
     
     with col4:
-        avg_liquidity = df['liquidity_score'].mean() if 'liquidity_score' in df.columns else 0
-        st.markdown("""
+        st.markdown(f"""
         <div style="background: linear-gradient(135deg, #43e97b 0%, #38f9d7 100%); 
                     padding: 20px; border-radius: 10px; color: white; text-align: center; margin-bottom: 10px;">
             <h4 style="margin: 0; font-size: 16px;">⭐ Avg Liquidity Score</h4>
-            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">{:.1f}</h2>
+            <h2 style="margin: 10px 0; font-size: 28px; font-weight: bold;">{summary['avg_liquidity']:.1f}</h2>
         </div>
-        """.format(avg_liquidity), unsafe_allow_html=True)
-    
-    # Apply all filters with enhanced logic including search
-    filtered_df = df.copy()
+        """, unsafe_allow_html=True)
     
     # Apply search filter first
-    if search_query and search_query.strip():
-        filtered_df = apply_search_filter(filtered_df, search_query)
-        if len(filtered_df) == 0:
-            st.warning(f"🔍 No pools found matching '{search_query}'. Try a different search term or clear the search.")
-            return
-    
-    # Apply volume filter
-    if min_volume > 0 and 'volume_usd' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['volume_usd'] >= min_volume]
-    
-    # Apply volume tier filter
-    if volume_tier != "All Volumes" and 'volume_usd' in filtered_df.columns:
-        if "Whale" in volume_tier:
-            filtered_df = filtered_df[filtered_df['volume_usd'] >= 1000000]
-        elif "Shark" in volume_tier:
-            filtered_df = filtered_df[filtered_df['volume_usd'] >= 100000]
-        elif "Fish" in volume_tier:
-            filtered_df = filtered_df[filtered_df['volume_usd'] >= 10000]
-    
-    # Apply trust grade filter
-    if trust_grades and 'trust_grade' in filtered_df.columns:
-        if len(trust_grades) < 4:  # Not all grades selected
-            filtered_df = filtered_df[filtered_df['trust_grade'].isin(trust_grades)]
-    
-    # Apply liquidity score filter
-    if min_liquidity_score > 0 and 'liquidity_score' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['liquidity_score'] >= min_liquidity_score]
-    
-    # Apply quick filters (if session state exists)
-    if 'quick_filter' in st.session_state:
-        if st.session_state.quick_filter == "high_volume" and 'volume_usd' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['volume_usd'] >= 1000000]  # >$1M
-        elif st.session_state.quick_filter == "top_rated" and 'trust_grade' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['trust_grade'] == 'A']
-        elif st.session_state.quick_filter == "trending" and 'volume_usd' in filtered_df.columns:
-            volume_threshold = filtered_df['volume_usd'].quantile(0.8)
-            filtered_df = filtered_df[filtered_df['volume_usd'] >= volume_threshold]
-    
-    # Advanced filters
-    if show_trending and 'volume_usd' in filtered_df.columns:
-        # Show top 20% by volume as "trending"
-        volume_threshold = filtered_df['volume_usd'].quantile(0.8)
-        filtered_df = filtered_df[filtered_df['volume_usd'] >= volume_threshold]
-    
-    if show_stable and 'trading_pair' in filtered_df.columns:
-        # Filter for major stable pairs
-        stable_tokens = ['USDT', 'USDC', 'DAI', 'WETH', 'WBTC']
-        mask = pd.Series([False] * len(filtered_df))
-        for token in stable_tokens:
-            mask |= filtered_df['trading_pair'].str.contains(token, case=False, na=False)
-        filtered_df = filtered_df[mask]
+    if search_query and search_query.strip() and not search_mask(df, search_query).any():
+        st.warning(f"🔍 No pools found matching '{search_query}'. Try a different search term or clear the search.")
+        return
     
-    # Market filter (use main page selection if available)
+    # Apply all filters (market filter uses main page selection if available)
     markets_to_use = selected_markets_main if selected_markets_main is not None else selected_markets
-    if markets_to_use and 'market' in filtered_df.columns:
-        available_markets = df['market'].dropna().unique().tolist()
-        if len(markets_to_use) < len(available_markets):
-            filtered_df = filtered_df[filtered_df['market'].isin(markets_to_use)]
+    filter_args = (
+        search_query, min_volume, volume_tier, tuple(trust_grades), min_liquidity_score,
+        st.session_state.get('quick_filter'), show_trending, show_stable,
+        tuple(markets_to_use) if markets_to_use else None
+    )
+    positions = filtered_positions(df, *filter_args)
+    filtered_df = df if positions is None else df.iloc[positions]
     
     # Sorting
-    if sort_by in filtered_df.columns:
+    if sort_by in cols:
         try:
             filtered_df = filtered_df.sort_values(by=sort_by, ascending=ascending)
         except Exception:
@@ -657,20 +1029,19 @@ def main():
     with tab1:
         st.subheader("🔍 Pool Data")
         
-        default_columns = ['trading_pair', 'volume_formatted', 'base', 'target', 
+        default_columns = ['trading_pair', 'volume_usd', 'base', 'target', 
                          'last_price', 'bid_ask_spread', 'liquidity_score', 
                          'trust_grade', 'market']
-        display_columns = [col for col in default_columns if col in filtered_df.columns]
+        display_columns = [col for col in default_columns if col in cols]
         
         if display_columns and len(filtered_df) > 0:
             display_df = filtered_df[display_columns]
-            # Rename volume_formatted column to Volume($) for display
-            if 'volume_formatted' in display_df.columns:
-                display_df = display_df.rename(columns={'volume_formatted': 'Volume($)'})
+            # Show volume as a formatted Volume($) column
+            display_df = format_volume(display_df)
             st.dataframe(display_df, use_container_width=True, height=500)
             
             # Download button
-            csv = display_df.to_csv(index=False)
+            csv = csv_bytes(display_df, (_frame_key(df), filter_args, sort_by, ascending, tuple(display_columns)))
             filename_suffix = f"_search_{search_query.replace(' ', '_')}" if search_query else ""
             st.download_button(
                 label="📥 Download CSV",
@@ -697,31 +1068,35 @@ def main():
             
             with col_a:
                 st.write("**💰 Highest Volume Pools**")
-                if 'volume_usd' in filtered_df.columns:
-                    top_volume_cols = [col for col in ['trading_pair', 'volume_formatted', 'liquidity_score', 'trust_grade'] 
-                                     if col in filtered_df.columns]
-                    top_volume = filtered_df.nlargest(10, 'volume_usd')[top_volume_cols]
-                    if 'volume_formatted' in top_volume.columns:
-                        top_volume = top_volume.rename(columns={'volume_formatted': 'Volume($)'})
+                if 'volume_usd' in cols:
+                    top_volume_cols = [col for col in ['trading_pair', 'volume_usd', 'liquidity_score', 'trust_grade'] 
+                                     if col in cols]
+                    top_vol_idx = top_k_positions(filtered_df['volume_usd'].to_numpy(dtype=float), 10)
+                    top_volume = filtered_df.iloc[top_vol_idx][top_volume_cols]
+                    top_volume = format_volume(top_volume)
                     st.dataframe(top_volume, use_container_width=True)
             
             with col_b:
                 st.write("**⭐ Highest Liquidity Score Pools**")
-                if 'liquidity_score' in filtered_df.columns:
-                    top_liquidity_cols = [col for col in ['trading_pair', 'liquidity_score', 'volume_formatted', 'trust_grade'] 
-                                        if col in filtered_df.columns]
-                    top_liquidity = filtered_df.nlargest(10, 'liquidity_score')[top_liquidity_cols]
-                    if 'volume_formatted' in top_liquidity.columns:
-                        top_liquidity = top_liquidity.rename(columns={'volume_formatted': 'Volume($)'})
+                if 'liquidity_score' in cols:
+                    top_liquidity_cols = [col for col in ['trading_pair', 'liquidity_score', 'volume_usd', 'trust_grade'] 
+                                        if col in cols]
+                    top_liq_idx = top_k_positions(filtered_df['liquidity_score'].to_numpy(dtype=float), 10)
+                    top_liquidity = filtered_df.iloc[top_liq_idx][top_liquidity_cols]
+                    top_liquidity = format_volume(top_liquidity)
                     st.dataframe(top_liquidity, use_container_width=True)
             
-            if 'bid_ask_spread' in filtered_df.columns and filtered_df['bid_ask_spread'].max() > 0:
+            # Only positive spreads are ranked; everything else is masked out as NaN
+            spreads = (filtered_df['bid_ask_spread'].to_numpy(dtype=float)
+                       if 'bid_ask_spread' in cols else np.array([]))
+            spreads = np.where(spreads > 0, spreads, np.nan)
+            if not np.isnan(spreads).all():
                 st.write("**🎯 Tightest Spreads Pools**")
-                tight_spreads_cols = [col for col in ['trading_pair', 'bid_ask_spread', 'volume_formatted', 'liquidity_score'] 
-                                    if col in filtered_df.columns]
-                tight_spreads = filtered_df[filtered_df['bid_ask_spread'] > 0].nsmallest(10, 'bid_ask_spread')[tight_spreads_cols]
-                if 'volume_formatted' in tight_spreads.columns:
-                    tight_spreads = tight_spreads.rename(columns={'volume_formatted': 'Volume($)'})
+                tight_spreads_cols = [col for col in ['trading_pair', 'bid_ask_spread', 'volume_usd', 'liquidity_score'] 
+                                    if col in cols]
+                tight_idx = top_k_positions(spreads, 10, largest=False)
+                tight_spreads = filtered_df.iloc[tight_idx][tight_spreads_cols]
+                tight_spreads = format_volume(tight_spreads)
                 st.dataframe(tight_spreads, use_container_width=True)
         else:
             st.warning("No data available for top performers with current filters.")
@@ -733,29 +1108,38 @@ def main():
                 import plotly.express as px
                 
                 st.write("**💎 Pool Efficiency Analysis: Volume vs Liquidity Score**")
-                if 'volume_usd' in filtered_df.columns and 'liquidity_score' in filtered_df.columns:
-                    chart_df = filtered_df.copy()
+                if 'volume_usd' in cols and 'liquidity_score' in cols:
+                    # Overlapping marks beyond a few thousand add render time, not information
+                    if len(filtered_df) > _SCATTER_MAX_POINTS:
+                        chart_df = filtered_df.sample(n=_SCATTER_MAX_POINTS, random_state=0)
+                    else:
+                        # Copy-on-write: only the columns modified below are copied
+                        chart_df = filtered_df.copy(deep=False)
                     # Clean liquidity_score (fix NaN issue)
-                    chart_df["liquidity_score"] = pd.to_numeric(chart_df["liquidity_score"], errors="coerce").fillna(0)
+                    # liquidity_score is numeric since load; NaN becomes 0 in one NumPy pass
+                    chart_df["liquidity_score"] = np.nan_to_num(
+                        chart_df["liquidity_score"].to_numpy(), nan=0.0, posinf=np.inf, neginf=-np.inf
+                    )
                     
                     size_column = None
-                    if 'bid_ask_spread' in chart_df.columns:
+                    if 'bid_ask_spread' in cols:
                         chart_df['spread_size'] = chart_df['bid_ask_spread'].abs() + 0.1
                         size_column = 'spread_size'
                     
                     hover_data = ['trading_pair']
-                    if 'market' in chart_df.columns:
+                    if 'market' in cols:
                         hover_data.append('market')
                     
                     fig_scatter = px.scatter(
                         chart_df,
                         x='volume_usd',
                         y='liquidity_score',
-                        color='trust_grade' if 'trust_grade' in chart_df.columns else None,
+                        color='trust_grade' if 'trust_grade' in cols else None,
                         size=size_column,
                         hover_data=hover_data,
                         title="Pool Efficiency: Higher Volume + Higher Liquidity = Better Pools",
-                        labels={'volume_usd': 'Volume (USD)', 'liquidity_score': 'Liquidity Score'}
+                        labels={'volume_usd': 'Volume (USD)', 'liquidity_score': 'Liquidity Score'},
+                        render_mode='webgl'
                     )
                     fig_scatter.update_layout(height=500)
                     st.plotly_chart(fig_scatter, use_container_width=True)
@@ -763,14 +1147,14 @@ def main():
                     st.warning("Volume or liquidity score data not available for scatter plot.")
                 
                 st.write("**🏆 Top 20 Pools by Volume**")
-                if 'volume_usd' in filtered_df.columns and 'trading_pair' in filtered_df.columns:
+                if 'volume_usd' in cols and 'trading_pair' in cols:
                     top_20_volume = filtered_df.nlargest(20, 'volume_usd')
                     fig_bar = px.bar(
                         top_20_volume,
                         x='volume_usd',
                         y='trading_pair',
                         orientation='h',
-                        color='trust_grade' if 'trust_grade' in top_20_volume.columns else None,
+                        color='trust_grade' if 'trust_grade' in cols else None,
                         title="Highest Volume Trading Pairs",
                         labels={'volume_usd': 'Volume (USD)', 'trading_pair': 'Trading Pair'}
                     )
@@ -780,10 +1164,21 @@ def main():
                     st.warning("Volume or trading pair data not available for bar chart.")
                 
                 st.write("**📊 Bid-Ask Spread Distribution by Market**")
-                if 'bid_ask_spread' in filtered_df.columns and 'market' in filtered_df.columns:
-                    spread_by_market = filtered_df.groupby('market')['bid_ask_spread'].agg(['mean', 'count']).reset_index()
-                    spread_by_market.columns = ['market', 'avg_spread', 'pool_count']
-                    spread_by_market = spread_by_market[spread_by_market['pool_count'] >= 3]
+                if 'bid_ask_spread' in cols and 'market' in cols:
+                    # Per-market sums and counts in one bincount pass over the category codes
+                    markets_cat = pd.Categorical(filtered_df['market'])
+                    codes = markets_cat.codes.astype(np.intp)
+                    spreads = filtered_df['bid_ask_spread'].to_numpy(dtype=np.float64)
+                    valid = (codes >= 0) & ~np.isnan(spreads)
+                    n_markets = len(markets_cat.categories)
+                    sums = np.bincount(codes[valid], weights=spreads[valid], minlength=n_markets)
+                    counts = np.bincount(codes[valid], minlength=n_markets)
+                    keep = counts >= 3
+                    spread_by_market = pd.DataFrame({
+                        'market': np.asarray(markets_cat.categories)[keep],
+                        'avg_spread': sums[keep] / counts[keep],
+                        'pool_count': counts[keep],
+                    })
                     if not spread_by_market.empty:
                         fig_spread = px.bar(
                             spread_by_market,
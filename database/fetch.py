@@ -3,11 +3,19 @@
 # ==========================
 import requests
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
 import time
 import logging
 import hashlib
+import sqlite3
+import asyncio
+import concurrent.futures
+import random
+import aiohttp
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # ==========================
 # LOGGING SETUP
@@ -27,88 +35,178 @@ DATA_DIR = "data"
 os.makedirs(CACHE_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Cache files (temporary/internal use)
+# Cache files (temporary/internal use); read back with the multithreaded
+# pyarrow CSV parser
 COINGECKO_CACHE = os.path.join(CACHE_DIR, "coingecko_full_data_cache.csv")
-DEFILLAMA_CACHE = os.path.join(CACHE_DIR, "defillama_metadata_cache.csv")
+DEFILLAMA_CACHE = os.path.join(CACHE_DIR, "defillama_metadata_cache.csv")  # Seeds DEFILLAMA_DB
+# Per-address metadata store: repeat runs only fetch addresses not seen before
+DEFILLAMA_DB = os.path.join(CACHE_DIR, "defillama_meta.sqlite")
 
 # Output files (final results)
 FULL_OUTPUT = os.path.join(DATA_DIR, "uniswap_v3_full_refined.csv")
+FULL_OUTPUT_PARQUET = os.path.join(DATA_DIR, "uniswap_v3_full_refined.parquet")
 TOP100_OUTPUT = os.path.join(DATA_DIR, "uniswap_v3_top100_pools.csv")
 
+# ==========================
+# COINGECKO REQUEST SETTINGS
+# ==========================
+COINGECKO_TICKERS_URL = "https://api.coingecko.com/api/v3/exchanges/uniswap_v3/tickers"
+PAGE_SIZE = 100
+CONCURRENT_PAGES = 5     # Pages requested at once (and per batch)
+BATCH_DELAY = 1.2        # Pause between batches (seconds)
+BACKOFF_BASE = 2.0       # First 429 backoff (seconds), doubled per attempt
+BACKOFF_MAX = 60.0       # Longest wait between 429 retries (seconds)
+
+# ==========================
+# HTTP SESSION
+# ==========================
+# One pooled session keeps connections (and TLS) alive across batches.
+# urllib3 retries 429/5xx with backoff and honours Retry-After.
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "High-Liquidity-Pool-Finder/1.0"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=1.5, status_forcelist=[429, 502, 503, 504])
+))
+
 # ==========================
 # STEP 1: FETCH COINGECKO LP DATA
 # ==========================
+async def fetch_page(session, semaphore, page, investigate=True):
+    """Fetch one tickers page, retrying 429s with exponential backoff and jitter
+    
+    Rate limits are retried until the page comes through, as the sequential
+    fetch always did; giving up would silently truncate the pool list.
+    """
+    params = {"page": page, "per_page": PAGE_SIZE}
+    attempt = 0
+    
+    while True:
+        async with semaphore:
+            async with session.get(COINGECKO_TICKERS_URL, params=params) as resp:
+                if resp.status != 429:
+                    resp.raise_for_status()
+                    tickers = (await resp.json()).get("tickers", [])
+                    
+                    # Investigation logging
+                    if investigate:
+                        print(f"📊 Page {page}: {len(tickers)} tickers, Status: {resp.status}")
+                    return tickers
+                retry_after = resp.headers.get("Retry-After", "")
+        
+        # Back off outside the semaphore so other pages can proceed
+        if retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX)
+        delay += random.uniform(0, 1)
+        attempt += 1
+        print(f"⚠️ Rate limited at page {page} - retrying in {delay:.1f} seconds")
+        await asyncio.sleep(delay)
+
+async def fetch_all_pages(investigate=True):
+    """Fetch ticker pages in concurrent batches until a short or empty page
+    
+    Returns (pools, last_page, complete); complete is False when the fetch
+    stopped on an error rather than at the real last page.
+    """
+    all_pools = []
+    last_page = 0
+    complete = False
+    semaphore = asyncio.Semaphore(CONCURRENT_PAGES)
+    timeout = aiohttp.ClientTimeout(total=10)
+    
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        page = 1
+        while True:
+            batch = range(page, page + CONCURRENT_PAGES)
+            results = await asyncio.gather(
+                *[fetch_page(session, semaphore, p, investigate) for p in batch],
+                return_exceptions=True
+            )
+            
+            # Pages are processed in order; anything past the last page is dropped
+            finished = False
+            for p, tickers in zip(batch, results):
+                if isinstance(tickers, Exception):
+                    print(f"❌ Error fetching page {p}: {tickers}")
+                    finished = True
+                    break
+                
+                last_page = p
+                
+                # Process tickers
+                for t in tickers:
+                    all_pools.append({
+                        "page": p,
+                        "base": t.get("base"),
+                        "target": t.get("target"),
+                        "last_price": t.get("last"),
+                        "volume_usd": t.get("converted_volume", {}).get("usd", 0),
+                        "bid_ask_spread": t.get("bid_ask_spread_percentage"),
+                        "trust_score": t.get("trust_score"),
+                        "market": t.get("market", {}).get("name", ""),
+                        "coin_id": t.get("coin_id", ""),
+                        "target_coin_id": t.get("target_coin_id", "")
+                    })
+                
+                # Check if this is the last page
+                if not tickers:
+                    print(f"🏁 LAST PAGE: {p} - Empty response")
+                    finished = complete = True
+                    break
+                elif len(tickers) < PAGE_SIZE:
+                    print(f"🏁 LAST PAGE: {p} - Partial page ({len(tickers)} tickers)")
+                    finished = complete = True
+                    break
+            
+            if finished:
+                break
+            
+            page += CONCURRENT_PAGES
+            await asyncio.sleep(BATCH_DELAY)  # Normal rate limit
+    
+    return all_pools, last_page, complete
+
+def run_async(coro):
+    """Run a coroutine to completion, also when called from a running event loop
+    
+    asyncio.run() refuses to nest (e.g. inside Jupyter), so in that case the
+    coroutine gets its own loop on a worker thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
 def fetch_uniswap_v3_pools(use_cache=True, force_refresh=False, investigate=True):
     # Check for cached data
     if use_cache and not force_refresh and os.path.exists(COINGECKO_CACHE):
         print(f"✅ Loading cached data from {COINGECKO_CACHE}")
-        cached_df = pd.read_csv(COINGECKO_CACHE)
+        cached_df = pd.read_csv(COINGECKO_CACHE, engine="pyarrow")
         print(f"📁 Cached data: {len(cached_df)} pools from {cached_df['page'].max()} pages")
         return cached_df
     
-    all_pools = []
-    page = 1
-    last_page = 0
-    
     print("🚀 Starting fresh CoinGecko data fetch...")
     
-    while True:
-        url = f"https://api.coingecko.com/api/v3/exchanges/uniswap_v3/tickers"
-        params = {"page": page, "per_page": 100}
-        
-        try:
-            resp = requests.get(url, params=params, timeout=10)
-            resp.raise_for_status()
-            tickers = resp.json().get("tickers", [])
-            
-            # Investigation logging
-            if investigate:
-                print(f"📊 Page {page}: {len(tickers)} tickers, Status: {resp.status_code}")
-            
-            last_page = page
-            
-            # Process tickers
-            for t in tickers:
-                all_pools.append({
-                    "page": page,
-                    "base": t.get("base"),
-                    "target": t.get("target"),
-                    "last_price": t.get("last"),
-                    "volume_usd": t.get("converted_volume", {}).get("usd", 0),
-                    "bid_ask_spread": t.get("bid_ask_spread_percentage"),
-                    "trust_score": t.get("trust_score"),
-                    "market": t.get("market", {}).get("name", ""),
-                    "coin_id": t.get("coin_id", ""),
-                    "target_coin_id": t.get("target_coin_id", "")
-                })
-            
-            # Check if this is the last page
-            if not tickers:
-                print(f"🏁 LAST PAGE: {page} - Empty response")
-                break
-            elif len(tickers) < 100:
-                print(f"🏁 LAST PAGE: {page} - Partial page ({len(tickers)} tickers)")
-                break
-            
-            page += 1
-            time.sleep(1.2)  # Normal rate limit
-            
-        except requests.exceptions.RequestException as e:
-            if hasattr(e, 'response') and e.response.status_code == 429:
-                print(f"⚠️ Rate limited at page {page} - waiting 60 seconds")
-                time.sleep(60)
-                continue
-            else:
-                print(f"❌ Error fetching page {page}: {e}")
-                break
-        except Exception as e:
-            print(f"❌ Unexpected error at page {page}: {e}")
-            break
+    # Pages are fetched CONCURRENT_PAGES at a time so round-trips overlap
+    try:
+        all_pools, last_page, complete = run_async(fetch_all_pages(investigate))
+    except Exception as e:
+        print(f"❌ Unexpected error during fetch: {e}")
+        all_pools, last_page, complete = [], 0, False
     
     df = pd.DataFrame(all_pools)
     
-    # Cache the complete dataset with smart update
-    if not df.empty:
+    # Cache the complete dataset with smart update; a fetch cut short by an
+    # error is returned for this run but never cached, so later cached runs
+    # don't keep serving a truncated pool list
+    if not complete:
+        print(f"⚠️ Fetch stopped after page {last_page} on an error - not caching partial data")
+    elif not df.empty:
         if smart_save_csv(df, COINGECKO_CACHE, "CoinGecko cache"):
             print(f"💾 Cached complete dataset to {COINGECKO_CACHE}")
         else:
@@ -121,90 +219,126 @@ def fetch_uniswap_v3_pools(use_cache=True, force_refresh=False, investigate=True
         print(f"   Total pools found: {len(df)}")
         print(f"   Volume range: ${df['volume_usd'].min():,.0f} - ${df['volume_usd'].max():,.0f}")
         
-        # Page distribution
-        page_counts = df['page'].value_counts().sort_index()
+        # Page distribution (already in page order)
+        pages, counts = np.unique(df['page'].to_numpy(), return_counts=True)
         print(f"   Pools per page:")
-        for p in sorted(page_counts.index)[:5]:  # Show first 5 pages
-            print(f"     Page {p}: {page_counts[p]} pools")
-        if len(page_counts) > 5:
-            print(f"     ... and {len(page_counts)-5} more pages")
+        for p, count in zip(pages[:5], counts[:5]):  # Show first 5 pages
+            print(f"     Page {p}: {count} pools")
+        if len(pages) > 5:
+            print(f"     ... and {len(pages)-5} more pages")
     
     return df
 
 # ==========================
 # STEP 2: FETCH DEFILLAMA METADATA
 # ==========================
+METADATA_COLUMNS = ["address", "symbol", "decimals", "price"]
+
+def open_metadata_db():
+    """Open the DefiLlama metadata store, creating the table on first use"""
+    is_new = not os.path.exists(DEFILLAMA_DB)
+    conn = sqlite3.connect(DEFILLAMA_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS meta ("
+        "address TEXT PRIMARY KEY, symbol TEXT, decimals INTEGER, price REAL, fetched_at TEXT)"
+    )
+    
+    # Import the old single-file cache once instead of re-fetching it all
+    if is_new and os.path.exists(DEFILLAMA_CACHE):
+        legacy = pd.read_csv(DEFILLAMA_CACHE, engine="pyarrow")
+        legacy = legacy.astype(object).where(legacy.notna(), None)
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, NULL)",
+                zip(legacy['address'].str.lower(), legacy['symbol'], legacy['decimals'], legacy['price'])
+            )
+        print(f"📁 Imported {len(legacy)} cached tokens from {DEFILLAMA_CACHE}")
+    return conn
+
+def query_metadata(conn, addresses, columns="address, symbol, decimals, price"):
+    """Rows of the metadata store for the given addresses"""
+    rows = []
+    # Chunked to stay under SQLite's bound-parameter limit
+    for i in range(0, len(addresses), 500):
+        chunk = addresses[i:i+500]
+        placeholders = ",".join("?" * len(chunk))
+        rows.extend(conn.execute(
+            f"SELECT {columns} FROM meta WHERE address IN ({placeholders})", chunk
+        ).fetchall())
+    return rows
+
 def fetch_defillama_metadata(token_addresses, use_cache=True, force_refresh=False):
-    # Check for cached data
-    if use_cache and not force_refresh and os.path.exists(DEFILLAMA_CACHE):
-        print(f"✅ Loading cached metadata from {DEFILLAMA_CACHE}")
-        cached_df = pd.read_csv(DEFILLAMA_CACHE)
-        print(f"📁 Cached metadata: {len(cached_df)} tokens")
-        return cached_df
-    
-    print("🚀 Starting fresh DefiLlama metadata fetch...")
-    
     metadata = []
     if not token_addresses:
         return pd.DataFrame(metadata)
     
     # Filter out non-address tokens (already symbols)
-    address_tokens = [addr for addr in token_addresses if addr.startswith('0x') or addr.startswith('0X')]
+    address_tokens = list(dict.fromkeys(
+        addr.lower() for addr in token_addresses
+        if isinstance(addr, str) and (addr.startswith('0x') or addr.startswith('0X'))
+    ))
     
     if not address_tokens:
         print("❌ No contract addresses found to fetch metadata for")
         return pd.DataFrame(metadata)
     
-    print(f"📊 Fetching metadata for {len(address_tokens)} token addresses...")
-    
-    # Batch addresses to avoid URL length limits
-    batch_size = 50
-    for i in range(0, len(address_tokens), batch_size):
-        batch = address_tokens[i:i+batch_size]
-        keys = [f"ethereum:{addr.lower()}" for addr in batch]
-        url = f"https://coins.llama.fi/prices/current/{','.join(keys)}"
+    with open_metadata_db() as conn:
+        # Check for cached addresses
+        if use_cache and not force_refresh:
+            cached = {row[0] for row in query_metadata(conn, address_tokens, columns="address")}
+            print(f"✅ Cached metadata for {len(cached)} of {len(address_tokens)} addresses in {DEFILLAMA_DB}")
+            missing = [addr for addr in address_tokens if addr not in cached]
+        else:
+            missing = address_tokens
         
-        try:
-            print(f"📊 Fetching batch {i//batch_size + 1}/{(len(address_tokens)-1)//batch_size + 1}")
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            coins = resp.json().get("coins", {})
-            
-            for k, v in coins.items():
-                addr = k.split(":")[1].lower()
-                metadata.append({
-                    "address": addr,
-                    "symbol": v.get("symbol"),
-                    "decimals": v.get("decimals"),
-                    "price": v.get("price")
-                })
-            
-            time.sleep(1.2)  # Rate limiting between batches
+        if missing:
+            print(f"🚀 Fetching DefiLlama metadata for {len(missing)} token addresses...")
+        
+        # Batch addresses to avoid URL length limits
+        batch_size = 50
+        fetched_at = datetime.now().isoformat(timespec='seconds')
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i+batch_size]
+            keys = [f"ethereum:{addr}" for addr in batch]
+            url = f"https://coins.llama.fi/prices/current/{','.join(keys)}"
             
-        except requests.exceptions.RequestException as e:
-            if hasattr(e, 'response') and e.response.status_code == 429:
-                print(f"⚠️ Rate limited on batch {i//batch_size + 1} - waiting 60 seconds")
-                time.sleep(60)
-                continue
-            else:
+            try:
+                print(f"📊 Fetching batch {i//batch_size + 1}/{(len(missing)-1)//batch_size + 1}")
+                resp = SESSION.get(url, timeout=10)
+                resp.raise_for_status()
+                coins = resp.json().get("coins", {})
+                
+                # Addresses DefiLlama doesn't know are stored empty, so they
+                # aren't re-requested on every run (force_refresh retries them)
+                found = {addr: (addr, None, None, None, fetched_at) for addr in batch}
+                for k, v in coins.items():
+                    addr = k.split(":")[1].lower()
+                    found[addr] = (addr, v.get("symbol"), v.get("decimals"), v.get("price"), fetched_at)
+                metadata.extend(found.values())
+                
+                time.sleep(1.2)  # Rate limiting between batches
+                
+            except requests.exceptions.RequestException as e:
+                # Rate limits were already retried by the session
                 print(f"❌ Error fetching batch {i//batch_size + 1}: {e}")
                 continue
-        except Exception as e:
-            print(f"❌ Unexpected error on batch {i//batch_size + 1}: {e}")
-            continue
-    
-    df_meta = pd.DataFrame(metadata)
-    
-    # Cache the metadata with smart update
-    if not df_meta.empty:
-        if smart_save_csv(df_meta, DEFILLAMA_CACHE, "DefiLlama metadata cache"):
-            print(f"💾 Cached metadata to {DEFILLAMA_CACHE}")
-            print(f"📊 Successfully fetched metadata for {len(df_meta)} tokens")
-        else:
-            print(f"💾 DefiLlama cache already up to date")
-    else:
-        print("❌ No metadata fetched")
+            except Exception as e:
+                print(f"❌ Unexpected error on batch {i//batch_size + 1}: {e}")
+                continue
+        
+        # Cache the new metadata
+        if metadata:
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?)", metadata)
+            print(f"💾 Cached metadata for {len(metadata)} addresses to {DEFILLAMA_DB}")
+        elif missing:
+            print("❌ No metadata fetched")
+        
+        rows = query_metadata(conn, address_tokens)
+    conn.close()
     
+    df_meta = pd.DataFrame(rows, columns=METADATA_COLUMNS)
+    df_meta = df_meta.dropna(subset=["symbol", "decimals", "price"], how="all")
+    print(f"📁 Metadata available for {len(df_meta)} tokens")
     return df_meta
 
 # ==========================
@@ -217,8 +351,12 @@ def get_dataframe_hash(df):
     # Create hash based on DataFrame content (excluding index)
     # Sort columns for consistent hashing regardless of column order
     df_sorted = df.reindex(sorted(df.columns), axis=1)
-    df_string = df_sorted.to_csv(index=False)
-    return hashlib.md5(df_string.encode()).hexdigest()
+    # Per-row hashes from pandas' vectorized hasher, instead of serializing
+    # the whole frame to a CSV string first
+    row_hashes = pd.util.hash_pandas_object(df_sorted, index=False)
+    digest = hashlib.md5(",".join(map(str, df_sorted.columns)).encode())
+    digest.update(row_hashes.to_numpy().tobytes())
+    return digest.hexdigest()
 
 def smart_save_csv(df, filename, description="data"):
     """Save CSV only if content has changed"""
@@ -255,63 +393,74 @@ def smart_save_csv(df, filename, description="data"):
     except Exception as e:
         print(f"❌ Error saving {filename}: {e}")
         return False
+
 def integrate_metadata(lp_df, llama_df):
     print(f"🔄 Converting addresses to symbols...")
     
-    # Create metadata lookup dictionary
-    metadata = {row['address'].lower(): row for idx, row in llama_df.iterrows()}
+    # Create metadata lookup dictionary (address -> symbol), straight from the
+    # two column arrays; entries without a usable symbol are left out so they
+    # fall through to the address fallback
+    has_symbol = llama_df['symbol'].notna() & (llama_df['symbol'] != '')
+    metadata = dict(zip(
+        llama_df.loc[has_symbol, 'address'].str.lower().values,
+        llama_df.loc[has_symbol, 'symbol'].values
+    ))
     
     print(f"📊 Metadata available for {len(metadata)} addresses")
     
-    def get_symbol(addr):
-        if not isinstance(addr, str):
-            return str(addr)
+    def to_symbols(tokens):
+        """Vectorized address -> symbol conversion for a whole column"""
+        text = tokens.astype(str)  # Non-strings become str(value), as before
         
-        # Clean address
-        addr_clean = addr.strip().lower()
+        # Clean addresses and check which are contract addresses
+        clean = text.str.strip().str.lower()
+        is_addr = clean.str.startswith('0x') & (clean.str.len() == 42)
         
-        # Check if it's a contract address
-        if addr_clean.startswith('0x') and len(addr_clean) == 42:
-            symbol = metadata.get(addr_clean, {}).get("symbol")
-            if symbol:
-                return symbol
-            else:
-                return addr[:8]+"..."  # Fallback for unknown addresses
-        else:
-            return addr  # Already a symbol or different format
-    
-    # Create copy and convert addresses to symbols
-    lp_df = lp_df.copy()
-    
-    print(f"🔄 Converting base addresses...")
-    lp_df['base_symbol'] = lp_df['base'].apply(get_symbol)
+        # Known addresses get their symbol; unknown ones a shortened fallback.
+        # Anything else is already a symbol or a different format.
+        symbols = clean.map(metadata).fillna(text.str.slice(0, 8) + "...")
+        return pd.Series(np.where(is_addr, symbols, text), index=tokens.index)
+    
+    # Build every new column locally, then attach them in one assign()
+    # (which also returns the copy, leaving the caller's frame untouched)
+    # Base and target are converted in one pass over both columns stacked
+    print(f"🔄 Converting base and target addresses...")
+    n = len(lp_df)
+    combined = to_symbols(pd.concat([lp_df['base'], lp_df['target']], ignore_index=True)).to_numpy()
+    base = pd.Series(combined[:n], index=lp_df.index)
+    target = pd.Series(combined[n:], index=lp_df.index)
     
-    print(f"🔄 Converting target addresses...")
-    lp_df['target_symbol'] = lp_df['target'].apply(get_symbol)
+    # Create trading pair in SYMBOL/SYMBOL format
+    trading_pair = base + "/" + target
     
-    # Update base and target columns with symbols
-    lp_df['base'] = lp_df['base_symbol']
-    lp_df['target'] = lp_df['target_symbol']
+    volumes = lp_df['volume_usd'].to_numpy(dtype=np.float64)
     
-    # Create trading pair in SYMBOL/SYMBOL format
-    lp_df['trading_pair'] = lp_df['base'] + "/" + lp_df['target']
+    # Format volume for display (plain loop over the ndarray: no per-element
+    # Series boxing)
+    format_usd = '${:,.0f}'.format
+    volume_formatted = [format_usd(v) for v in volumes]
     
-    # Format volume for display
-    lp_df['volume_formatted'] = lp_df['volume_usd'].apply(lambda x: f"${x:,.0f}")
+    # Compute liquidity score: one pass for the max, one to scale and round
+    liquidity_score = np.round(volumes * (100.0 / np.nanmax(volumes)), 2)
     
-    # Compute liquidity score
-    lp_df['liquidity_score'] = (lp_df['volume_usd'] / lp_df['volume_usd'].max() * 100).round(2)
+    # Compute trust grade (first matching threshold wins; NaN scores get "D")
+    trust_grade = np.select(
+        [liquidity_score >= 80, liquidity_score >= 50, liquidity_score >= 20], ["A", "B", "C"], default="D"
+    )
     
-    # Compute trust grade
-    def trust_grade(score):
-        if score >= 80: return "A"
-        elif score >= 50: return "B"
-        elif score >= 20: return "C"
-        return "D"
-    lp_df['trust_grade'] = lp_df['liquidity_score'].apply(trust_grade)
+    lp_df = lp_df.assign(
+        base=base,
+        target=target,
+        trading_pair=trading_pair,
+        volume_formatted=volume_formatted,
+        liquidity_score=liquidity_score,
+        trust_grade=trust_grade
+    )
     
-    # Drop helper columns
-    lp_df = lp_df.drop(['base_symbol', 'target_symbol'], axis=1, errors='ignore')
+    # Heavily repeated labels as categoricals: integer codes for value_counts
+    # and groupbys, and dictionary-encoded columns in the Parquet export
+    for col in ('base', 'target', 'trading_pair', 'trust_grade'):
+        lp_df[col] = lp_df[col].astype('category')
     
     # Show conversion sample
     print(f"✅ Address conversion complete!")
@@ -325,78 +474,125 @@ def integrate_metadata(lp_df, llama_df):
 # ==========================
 # HIGH LP ANALYSIS FUNCTIONS
 # ==========================
+def sort_by_volume(df):
+    """Negated volumes in ascending order (largest volume first) and the page of each row
+    
+    Sorted once per analysis so each volume threshold is a binary search
+    instead of a fresh filter over the whole frame.
+    """
+    neg_volume = -df['volume_usd'].to_numpy(dtype=np.float64)
+    order = np.argsort(neg_volume, kind="stable")  # NaN volumes sort last
+    return neg_volume[order], df['page'].to_numpy()[order]
+
+def pages_above(neg_sorted, pages_sorted, threshold):
+    """Pages holding LPs with volume > threshold and their LP counts, by page"""
+    count = np.searchsorted(neg_sorted, -threshold, side='left')
+    return np.unique(pages_sorted[:count], return_counts=True)
+
+def top_volume_positions(df, k):
+    """Row positions of the top k pools by volume, same rows and order as nlargest(k)
+    
+    The kth highest volume comes from one O(N) np.partition; rows above it,
+    then the earliest rows equal to it, are kept, so ties stay in file order
+    as with keep='first'. NaN volumes only fill in when fewer than k are valid.
+    """
+    volumes = df['volume_usd'].to_numpy(dtype=np.float64)
+    is_nan = np.isnan(volumes)
+    valid = np.flatnonzero(~is_nan)
+    
+    if len(valid) > k:
+        valid_volumes = volumes[valid]
+        kth_volume = np.partition(valid_volumes, len(valid) - k)[len(valid) - k]
+        above = valid_volumes > kth_volume
+        at_kth = np.flatnonzero(valid_volumes == kth_volume)[:k - np.count_nonzero(above)]
+        above[at_kth] = True
+        valid = valid[above]  # Still in row order
+    
+    top = valid[np.argsort(-volumes[valid], kind="stable")]
+    if len(top) < k:
+        top = np.concatenate([top, np.flatnonzero(is_nan)[:k - len(top)]])
+    return top
+
 def analyze_high_lp_pages(df, volume_thresholds=[1000000, 100000, 50000, 10000]):
     """Analyze which pages contain high-value LPs"""
-    print("🔍 ANALYZING HIGH LP DISTRIBUTION BY PAGE\n")
+    # Collect the report and write it once instead of one print per line
+    lines = []
+    out = lines.append
+    out("🔍 ANALYZING HIGH LP DISTRIBUTION BY PAGE\n")
+    
+    neg_sorted, pages_sorted = sort_by_volume(df)
+    max_page = int(df['page'].max())
     
     for threshold in volume_thresholds:
-        print(f"💰 LPs with volume > ${threshold:,}")
+        out(f"💰 LPs with volume > ${threshold:,}")
         
-        # Filter high-volume LPs
-        high_lps = df[df['volume_usd'] > threshold].copy()
+        # Page distribution of the high-volume LPs
+        pages, counts = pages_above(neg_sorted, pages_sorted, threshold)
         
-        if len(high_lps) == 0:
-            print(f"   ❌ No LPs found above ${threshold:,}")
+        if len(pages) == 0:
+            out(f"   ❌ No LPs found above ${threshold:,}")
             continue
-            
-        # Page distribution
-        page_counts = high_lps['page'].value_counts().sort_index()
-        total_high_lps = len(high_lps)
         
-        print(f"   📊 Total count: {total_high_lps}")
-        print(f"   📄 Pages with high LPs: {len(page_counts)} out of {df['page'].max()}")
-        print(f"   🏁 Last page with high LP: Page {high_lps['page'].max()}")
-        print(f"   🎯 First page with high LP: Page {high_lps['page'].min()}")
+        total_high_lps = counts.sum()
+        
+        out(f"   📊 Total count: {total_high_lps}")
+        out(f"   📄 Pages with high LPs: {len(pages)} out of {max_page}")
+        out(f"   🏁 Last page with high LP: Page {pages[-1]}")
+        out(f"   🎯 First page with high LP: Page {pages[0]}")
         
         # Show distribution for first 10 pages that have high LPs
-        print(f"   📈 Distribution by page:")
-        for page in sorted(page_counts.index)[:10]:
-            count = page_counts[page]
+        out(f"   📈 Distribution by page:")
+        for page, count in zip(pages[:10], counts[:10]):
             percentage = (count / total_high_lps) * 100
-            print(f"      Page {page:2d}: {count:3d} LPs ({percentage:5.1f}%)")
+            out(f"      Page {page:2d}: {count:3d} LPs ({percentage:5.1f}%)")
         
-        if len(page_counts) > 10:
-            remaining_pages = len(page_counts) - 10
-            remaining_lps = sum(page_counts.iloc[10:])
+        if len(pages) > 10:
+            remaining_pages = len(pages) - 10
+            remaining_lps = counts[10:].sum()
             remaining_pct = (remaining_lps / total_high_lps) * 100
-            print(f"      ... {remaining_pages} more pages with {remaining_lps} LPs ({remaining_pct:.1f}%)")
+            out(f"      ... {remaining_pages} more pages with {remaining_lps} LPs ({remaining_pct:.1f}%)")
         
-        print("-" * 60)
+        out("-" * 60)
+    
+    print("\n".join(lines))
 
 def find_optimal_cutoff(df, target_percentage=90):
     """Find optimal page cutoff to capture X% of high-value LPs"""
-    print(f"🎯 FINDING OPTIMAL CUTOFF FOR {target_percentage}% OF HIGH LPs\n")
+    # Collect the report and write it once instead of one print per line
+    lines = []
+    out = lines.append
+    out(f"🎯 FINDING OPTIMAL CUTOFF FOR {target_percentage}% OF HIGH LPs\n")
     
     thresholds = [1000000, 100000, 50000, 10000]
+    neg_sorted, pages_sorted = sort_by_volume(df)
+    max_page = int(df['page'].max())
     
     for threshold in thresholds:
-        high_lps = df[df['volume_usd'] > threshold].copy()
+        pages, counts = pages_above(neg_sorted, pages_sorted, threshold)
         
-        if len(high_lps) == 0:
+        if len(pages) == 0:
             continue
-            
-        page_counts = high_lps['page'].value_counts().sort_index()
-        total_high_lps = len(high_lps)
-        target_count = int(total_high_lps * target_percentage / 100)
         
-        cumulative = 0
-        optimal_page = None
+        total_high_lps = counts.sum()
+        target_count = int(total_high_lps * target_percentage / 100)
         
-        for page in sorted(page_counts.index):
-            cumulative += page_counts[page]
-            if cumulative >= target_count:
-                optimal_page = page
-                break
+        # First page where the running LP count reaches the target
+        cumulative_counts = np.cumsum(counts)
+        idx = np.searchsorted(cumulative_counts, target_count, side='left')
+        optimal_page = pages[idx]
+        cumulative = cumulative_counts[idx]
         
         captured_pct = (cumulative / total_high_lps) * 100
-        time_saved = ((df['page'].max() - optimal_page) / df['page'].max()) * 100
+        time_saved = ((max_page - optimal_page) / max_page) * 100
         
-        print(f"💰 Volume > ${threshold:,}:")
-        print(f"   🎯 To capture {target_percentage}% ({target_count}/{total_high_lps} LPs)")
-        print(f"   📄 Optimal cutoff: Page {optimal_page}")
-        print(f"   ✅ Actually captures: {cumulative} LPs ({captured_pct:.1f}%)")
-        print(f"   ⚡ Time savings: {time_saved:.1f}%")
-        print()
+        out(f"💰 Volume > ${threshold:,}:")
+        out(f"   🎯 To capture {target_percentage}% ({target_count}/{total_high_lps} LPs)")
+        out(f"   📄 Optimal cutoff: Page {optimal_page}")
+        out(f"   ✅ Actually captures: {cumulative} LPs ({captured_pct:.1f}%)")
+        out(f"   ⚡ Time savings: {time_saved:.1f}%")
+        out("")
+    
+    print("\n".join(lines))
 
 # ==========================
 # MAIN EXECUTION
@@ -412,8 +608,9 @@ if __name__ == "__main__":
     if not pools_df.empty:
         print(f"\n🎯 COINGECKO DATA LOADED:")
         print(f"DataFrame shape: {pools_df.shape}")
-        print(f"Pools with >$1M volume: {(pools_df['volume_usd'] > 1000000).sum()}")
-        print(f"Pools with >$100K volume: {(pools_df['volume_usd'] > 100000).sum()}")
+        volumes = pools_df['volume_usd'].to_numpy()
+        print(f"Pools with >$1M volume: {np.count_nonzero(volumes > 1000000)}")
+        print(f"Pools with >$100K volume: {np.count_nonzero(volumes > 100000)}")
         
         # Analyze high LP distribution by page
         analyze_high_lp_pages(pools_df)
@@ -421,7 +618,13 @@ if __name__ == "__main__":
         find_optimal_cutoff(pools_df, target_percentage=95)
         
         # 2️⃣ Collect unique token addresses for metadata
-        unique_tokens = list(set(pools_df['base'].tolist() + pools_df['target'].tolist()))
+        # One hash-table pass over both columns; lowercased so the same address
+        # in different case counts once. Missing tokens are dropped first:
+        # astype(str) keeps NaN as NaN on pandas 3.
+        unique_tokens = pd.unique(
+            pd.concat([pools_df['base'], pools_df['target']], ignore_index=True)
+            .dropna().astype(str).str.lower()
+        ).tolist()
         print(f"\n🔍 Found {len(unique_tokens)} unique token addresses")
         
         # 3️⃣ Fetch metadata from DefiLlama
@@ -435,30 +638,32 @@ if __name__ == "__main__":
             print(f"✅ Integration complete!")
             
             # Apply top pools filtering by volume
-            top_pools = refined_df.nlargest(100, 'volume_usd').reset_index(drop=True)
+            top_pools = refined_df.iloc[top_volume_positions(refined_df, 100)].reset_index(drop=True)
             
             # Define display columns for cleaner output
             display_cols = ['trading_pair', 'volume_formatted', 'last_price', 'liquidity_score', 'trust_grade']
             
-            print(f"🎯 FILTERED TOP 100 POOLS:")
-            print(f"📊 DataFrame shape: {top_pools.shape}")
-            print(f"📊 Top 20 pools with converted symbols:")
-            print(top_pools[display_cols].head(20).to_string(index=False))
-            
-            print(f"\n📊 FULL DATAFRAME - Top 100 pools:")
-            print(top_pools.to_string(index=False))
+            # Top pools report, written in one go
+            lines = []
+            out = lines.append
+            out(f"🎯 FILTERED TOP 100 POOLS:")
+            out(f"📊 DataFrame shape: {top_pools.shape}")
+            out(f"📊 Top 20 pools with converted symbols:")
+            out(top_pools[display_cols].head(20).to_string(index=False))
             
-            print(f"\n📈 Top 100 pools statistics:")
-            print(f"   Volume range: ${top_pools['volume_usd'].min():,.0f} - ${top_pools['volume_usd'].max():,.0f}")
-            print(f"   Pages represented: {top_pools['page'].min()} to {top_pools['page'].max()}")
-            print(f"   Average liquidity score: {top_pools['liquidity_score'].mean():.1f}")
+            out(f"\n📈 Top 100 pools statistics:")
+            out(f"   Volume range: ${top_pools['volume_usd'].min():,.0f} - ${top_pools['volume_usd'].max():,.0f}")
+            out(f"   Pages represented: {top_pools['page'].min()} to {top_pools['page'].max()}")
+            out(f"   Average liquidity score: {top_pools['liquidity_score'].mean():.1f}")
             
             # Count by trust grade
             trust_counts = top_pools['trust_grade'].value_counts()
-            print(f"   Trust grade distribution:")
+            out(f"   Trust grade distribution:")
             for grade in ['A', 'B', 'C', 'D']:
                 count = trust_counts.get(grade, 0)
-                print(f"     Grade {grade}: {count} pools")
+                out(f"     Grade {grade}: {count} pools")
+            
+            print("\n".join(lines))
             
             # Save both full and filtered data with smart updates
             full_filename = FULL_OUTPUT
@@ -468,6 +673,27 @@ if __name__ == "__main__":
             full_updated = smart_save_csv(refined_df, full_filename, "full refined dataset")
             top_updated = smart_save_csv(top_pools, top_filename, "top 100 pools")
             
+            # Columnar copy of the full dataset - the dashboard loads this
+            # instead of re-parsing the CSV
+            parquet_stale = (not os.path.exists(FULL_OUTPUT_PARQUET)
+                             or (os.path.exists(full_filename)
+                                 and os.path.getmtime(FULL_OUTPUT_PARQUET) < os.path.getmtime(full_filename)))
+            if full_updated or parquet_stale:
+                # Write to a temp file first so the dashboard never reads a partial file
+                tmp_parquet = f"{FULL_OUTPUT_PARQUET}.{os.getpid()}.tmp"
+                try:
+                    refined_df.to_parquet(tmp_parquet, engine='pyarrow', compression='zstd', index=False)
+                    os.replace(tmp_parquet, FULL_OUTPUT_PARQUET)
+                    print(f"✅ Successfully saved {FULL_OUTPUT_PARQUET}")
+                except Exception as e:
+                    print(f"❌ Error saving {FULL_OUTPUT_PARQUET}: {e}")
+                    # Don't leave an out-of-date copy for the dashboard to prefer
+                    for stale_path in (tmp_parquet, FULL_OUTPUT_PARQUET):
+                        try:
+                            os.remove(stale_path)
+                        except FileNotFoundError:
+                            pass
+            
             # Summary of file operations
             print(f"\n📁 FILE UPDATE SUMMARY:")
             print(f"   Full dataset: {'Updated' if full_updated else 'No changes'} - {full_filename}")